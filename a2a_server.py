@@ -2,11 +2,18 @@
 import os
 import sys
 import asyncio
-import json
+import itertools
 import logging
 from typing import Dict, Any, Optional, List
 from uuid import uuid4
 
+import orjson
+
+try:
+    import uvloop
+except ImportError:  # uvloop is not available on Windows
+    uvloop = None
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -48,123 +55,192 @@ except ImportError as e:
 # Get settings
 settings = get_settings()
 
+# Maximum requests each agent server handles at once; beyond that, callers get a
+# busy error straight away instead of queueing on the event loop
+A2A_MAX_CONCURRENT = int(os.getenv("A2A_MAX_CONCURRENT", "64"))
+BUSY_ERROR = "Server busy, try again later"
+
+# Context shared by every executor unless a caller supplies its own
+DEFAULT_CONTEXT = GenAIContext()
+
+# Content modes shared by every agent card; each card gets its own list
+TEXT_INPUT_MODES = (ContentMode.TEXT_PLAIN,)
+JSON_MODES = (ContentMode.JSON,)
+
+# Skills advertised by each agent, validated once at import
+PLANNER_SKILL = A2AAgentSkill(
+    id="planner_agent",
+    name="Sustainable Planning Agent",
+    description="Creates sustainable coding plans for React components",
+    tags=["planning", "sustainability"]
+)
+
+EXECUTOR_SKILL = A2AAgentSkill(
+    id="executor_agent",
+    name="Code Execution Agent",
+    description="Generates React code based on sustainable plans",
+    tags=["react", "code-generation"]
+)
+
+AUDITOR_SKILL = A2AAgentSkill(
+    id="auditor_agent",
+    name="Sustainability Auditor",
+    description="Evaluates code plans for eco-friendliness",
+    tags=["sustainability", "audit"]
+)
+
+FULL_STACK_SKILL = A2AAgentSkill(
+    id="full_stack_agent",
+    name="Full Stack Sustainable Agent",
+    description="Orchestrates planning, execution, and auditing of sustainable code generation",
+    tags=["react", "sustainability", "code-generation"]
+)
+
+# Skill routing table: skill_id -> (agent function, JSON input key, accepts plain text).
+# A JSON input key of None means the agent receives the whole JSON payload.
+SKILL_HANDLERS = {
+    "planner_agent": (planner_agent, "user_request", True),
+    "executor_agent": (executor_agent, None, False),
+    "auditor_agent": (auditor_agent, None, False),
+    "full_stack_agent": (full_stack_agent, "prompt", True),
+}
+
+# MCP message IDs: one random UUID prefix per process plus a counter for the last
+# 12 hex digits, keeping the canonical UUID string shape without a urandom call per ID
+_MESSAGE_ID_PREFIX = str(uuid4())[:24]
+_message_id_seq = itertools.count()
+
+def _new_message_id():
+    """
+    Return a unique ID for an outgoing MCP message.
+    """
+    return f"{_MESSAGE_ID_PREFIX}{next(_message_id_seq) & 0xFFFFFFFFFFFF:012x}"
+
+def _json_agent_input(json_key, content):
+    """
+    Extract the agent argument from a JSON payload for the given input key.
+    """
+    return content if json_key is None else content.get(json_key, "")
+
+def _mcp_error_message(error, content_type=MCPContentType.TEXT):
+    """
+    Build an MCP message reporting an error, encoded for the given content type.
+    """
+    payload = {"error": error}
+    return MCPMessage(
+        id=_new_message_id(),
+        content=MCPMessageContent(
+            type=content_type,
+            content=payload if content_type == MCPContentType.JSON else orjson.dumps(payload).decode()
+        ),
+        metadata={"error": error}
+    )
+
 class GenAIAgentExecutor(A2AAgentExecutor):
     """
     Custom agent executor that adapts our agent functions to the A2A protocol.
     """
-    def __init__(self, agent_func, context=None):
+    def __init__(self, agent_func, context=None, limiter=None):
         self.agent_func = agent_func
-        self.context = context or GenAIContext()
+        self.context = context or DEFAULT_CONTEXT
+        self.limiter = limiter or asyncio.Semaphore(A2A_MAX_CONCURRENT)
         
     async def execute(self, content, skill_id, content_type=ContentType.TEXT_PLAIN):
+        """
+        Execute the agent function with the given content, rejecting it when the server is at capacity.
+        """
+        if self.limiter.locked():
+            logger.warning("Rejecting request for %s: concurrency limit reached", skill_id)
+            return {"error": BUSY_ERROR}
+        async with self.limiter:
+            return await self._execute(content, skill_id, content_type)
+        
+    async def _execute(self, content, skill_id, content_type):
         """
         Execute the agent function with the given content.
         """
         try:
-            logger.info(f"Executing agent {skill_id} with content type {content_type}")
+            logger.debug("Executing agent %s with content type %s", skill_id, content_type)
+            
+            handler = SKILL_HANDLERS.get(skill_id)
+            # Plain text for an unknown skill gets the "requires JSON input" error
+            agent, json_key, accepts_text = handler or (None, None, False)
             
             # Handle different content types
             if content_type == ContentType.APPLICATION_JSON:
-                if skill_id == "planner_agent":
-                    result = await planner_agent(self.context, content.get("user_request", ""))
-                elif skill_id == "executor_agent":
-                    result = await executor_agent(self.context, content)
-                elif skill_id == "auditor_agent":
-                    result = await auditor_agent(self.context, content)
-                elif skill_id == "full_stack_agent":
-                    result = await full_stack_agent(self.context, content.get("prompt", ""))
-                else:
-                    logger.error(f"Unknown skill ID: {skill_id}")
+                if handler is None:
+                    logger.error("Unknown skill ID: %s", skill_id)
                     return {"error": f"Unknown skill ID: {skill_id}"}
-            else:  # Assume plain text
-                if skill_id == "planner_agent":
-                    result = await planner_agent(self.context, content)
-                elif skill_id == "full_stack_agent":
-                    result = await full_stack_agent(self.context, content)
-                else:
-                    logger.error(f"Skill {skill_id} requires JSON input")
-                    return {"error": f"Skill {skill_id} requires JSON input"}
+                result = await agent(self.context, _json_agent_input(json_key, content))
+            elif accepts_text:  # Assume plain text
+                result = await agent(self.context, content)
+            else:
+                logger.error("Skill %s requires JSON input", skill_id)
+                return {"error": f"Skill {skill_id} requires JSON input"}
                     
             return result
         except Exception as e:
-            logger.error(f"Error executing agent: {e}")
+            logger.error("Error executing agent: %s", e)
             return {"error": str(e)}
 
 class MCPAgentExecutor:
     """
     Executor for handling MCP messages and forwarding them to the appropriate agent.
     """
-    def __init__(self, agent_func, context=None):
+    def __init__(self, agent_func, context=None, limiter=None):
         self.agent_func = agent_func
-        self.context = context or GenAIContext()
+        self.context = context or DEFAULT_CONTEXT
+        self.limiter = limiter or asyncio.Semaphore(A2A_MAX_CONCURRENT)
         
     async def execute_message(self, message: MCPMessage) -> MCPMessage:
+        """
+        Execute the agent function based on an MCP message, rejecting it when the server is at capacity.
+        """
+        if self.limiter.locked():
+            logger.warning("Rejecting MCP message: concurrency limit reached")
+            return _mcp_error_message(BUSY_ERROR)
+        async with self.limiter:
+            return await self._execute_message(message)
+        
+    async def _execute_message(self, message: MCPMessage) -> MCPMessage:
         """
         Execute the agent function based on an MCP message.
         """
         try:
-            logger.info(f"Executing MCP message: {message}")
+            logger.debug("Executing MCP message: %s", message)
             
             # Extract content from the message
             content = message.content
             skill_id = message.metadata.get("skill_id", "default_skill")
+            handler = SKILL_HANDLERS.get(skill_id)
             
             # Process the content based on its type
             if content.type == MCPContentType.TEXT:
                 text_content = content.content
                 
+                if handler is None:
+                    logger.error("Unknown skill ID in MCP message: %s", skill_id)
+                    return _mcp_error_message(f"Unknown skill ID: {skill_id}")
+                agent, _, accepts_text = handler
+                
                 # Route to the appropriate agent
-                if skill_id == "planner_agent":
-                    result = await planner_agent(self.context, text_content)
-                elif skill_id == "executor_agent":
-                    # For executor, try to parse JSON if possible
-                    try:
-                        json_content = json.loads(text_content)
-                        result = await executor_agent(self.context, json_content)
-                    except json.JSONDecodeError:
-                        logger.error("Failed to parse JSON for executor agent")
-                        return MCPMessage(
-                            id=str(uuid4()),
-                            content=MCPMessageContent(
-                                type=MCPContentType.TEXT,
-                                content=json.dumps({"error": "Invalid JSON input"})
-                            ),
-                            metadata={"error": "Invalid JSON input"}
-                        )
-                elif skill_id == "auditor_agent":
-                    # For auditor, try to parse JSON if possible
-                    try:
-                        json_content = json.loads(text_content)
-                        result = await auditor_agent(self.context, json_content)
-                    except json.JSONDecodeError:
-                        logger.error("Failed to parse JSON for auditor agent")
-                        return MCPMessage(
-                            id=str(uuid4()),
-                            content=MCPMessageContent(
-                                type=MCPContentType.TEXT,
-                                content=json.dumps({"error": "Invalid JSON input"})
-                            ),
-                            metadata={"error": "Invalid JSON input"}
-                        )
-                elif skill_id == "full_stack_agent":
-                    result = await full_stack_agent(self.context, text_content)
+                if accepts_text:
+                    result = await agent(self.context, text_content)
                 else:
-                    logger.error(f"Unknown skill ID in MCP message: {skill_id}")
-                    return MCPMessage(
-                        id=str(uuid4()),
-                        content=MCPMessageContent(
-                            type=MCPContentType.TEXT,
-                            content=json.dumps({"error": f"Unknown skill ID: {skill_id}"})
-                        ),
-                        metadata={"error": f"Unknown skill ID: {skill_id}"}
-                    )
+                    # Agents without plain-text support need the text parsed as JSON
+                    try:
+                        json_content = orjson.loads(text_content)
+                    except orjson.JSONDecodeError:
+                        logger.error("Failed to parse JSON for %s", skill_id)
+                        return _mcp_error_message("Invalid JSON input")
+                    result = await agent(self.context, json_content)
                 
                 # Return the result as an MCP message
                 return MCPMessage(
-                    id=str(uuid4()),
+                    id=_new_message_id(),
                     content=MCPMessageContent(
                         type=MCPContentType.TEXT,
-                        content=json.dumps(result) if isinstance(result, dict) else str(result)
+                        content=orjson.dumps(result).decode() if isinstance(result, dict) else str(result)
                     ),
                     metadata={"skill_id": skill_id}
                 )
@@ -172,29 +248,17 @@ class MCPAgentExecutor:
                 # Handle JSON content
                 json_content = content.content
                 
+                if handler is None:
+                    logger.error("Unknown skill ID in MCP message: %s", skill_id)
+                    return _mcp_error_message(f"Unknown skill ID: {skill_id}", MCPContentType.JSON)
+                agent, json_key, _ = handler
+                
                 # Route to the appropriate agent
-                if skill_id == "planner_agent":
-                    result = await planner_agent(self.context, json_content.get("user_request", ""))
-                elif skill_id == "executor_agent":
-                    result = await executor_agent(self.context, json_content)
-                elif skill_id == "auditor_agent":
-                    result = await auditor_agent(self.context, json_content)
-                elif skill_id == "full_stack_agent":
-                    result = await full_stack_agent(self.context, json_content.get("prompt", ""))
-                else:
-                    logger.error(f"Unknown skill ID in MCP message: {skill_id}")
-                    return MCPMessage(
-                        id=str(uuid4()),
-                        content=MCPMessageContent(
-                            type=MCPContentType.JSON,
-                            content={"error": f"Unknown skill ID: {skill_id}"}
-                        ),
-                        metadata={"error": f"Unknown skill ID: {skill_id}"}
-                    )
+                result = await agent(self.context, _json_agent_input(json_key, json_content))
                 
                 # Return the result as an MCP message
                 return MCPMessage(
-                    id=str(uuid4()),
+                    id=_new_message_id(),
                     content=MCPMessageContent(
                         type=MCPContentType.JSON,
                         content=result
@@ -202,25 +266,11 @@ class MCPAgentExecutor:
                     metadata={"skill_id": skill_id}
                 )
             else:
-                logger.error(f"Unsupported MCP content type: {content.type}")
-                return MCPMessage(
-                    id=str(uuid4()),
-                    content=MCPMessageContent(
-                        type=MCPContentType.TEXT,
-                        content=json.dumps({"error": f"Unsupported content type: {content.type}"})
-                    ),
-                    metadata={"error": f"Unsupported content type: {content.type}"}
-                )
+                logger.error("Unsupported MCP content type: %s", content.type)
+                return _mcp_error_message(f"Unsupported content type: {content.type}")
         except Exception as e:
-            logger.error(f"Error executing MCP message: {e}")
-            return MCPMessage(
-                id=str(uuid4()),
-                content=MCPMessageContent(
-                    type=MCPContentType.TEXT,
-                    content=json.dumps({"error": str(e)})
-                ),
-                metadata={"error": str(e)}
-            )
+            logger.error("Error executing MCP message: %s", e)
+            return _mcp_error_message(str(e))
 
 class GenAIMCPRequestHandler(MCPRequestHandler):
     """
@@ -235,7 +285,7 @@ class GenAIMCPRequestHandler(MCPRequestHandler):
         """
         return await self.executor.execute_message(message)
 
-def create_a2a_server_with_mcp(agent_func, skill, base_url, supports_json_input=False):
+def create_a2a_server_with_mcp(agent_func, skill, base_url, supports_json_input=False, context=None):
     """
     Create an A2A server with MCP support for a specific agent.
     
@@ -244,6 +294,7 @@ def create_a2a_server_with_mcp(agent_func, skill, base_url, supports_json_input=
         skill: The A2AAgentSkill for the agent
         base_url: The base URL for the agent
         supports_json_input: Whether the agent supports JSON input
+        context: The GenAIContext for the A2A and MCP executors; defaults to DEFAULT_CONTEXT
         
     Returns:
         A tuple of (A2AServer, MCPServer)
@@ -254,18 +305,21 @@ def create_a2a_server_with_mcp(agent_func, skill, base_url, supports_json_input=
         description=skill.description,
         url=base_url,
         version="1.0.0",
-        defaultInputModes=[ContentMode.TEXT_PLAIN] if not supports_json_input else [ContentMode.JSON],
-        defaultOutputModes=[ContentMode.JSON],
+        defaultInputModes=list(JSON_MODES if supports_json_input else TEXT_INPUT_MODES),
+        defaultOutputModes=list(JSON_MODES),
         capabilities=A2AAgentCapabilities(streaming=False, mcp=True),  # Enable MCP capability
         skills=[skill]
     )
     
+    # Both executors share one concurrency limit so A2A and MCP traffic together stay within it
+    limiter = asyncio.Semaphore(A2A_MAX_CONCURRENT)
+    
     # Create A2A executor and request handler
-    a2a_executor = GenAIAgentExecutor(agent_func)
+    a2a_executor = GenAIAgentExecutor(agent_func, context=context, limiter=limiter)
     a2a_handler = A2ARequestHandler(executor=a2a_executor)
     
     # Create MCP executor and request handler
-    mcp_executor = MCPAgentExecutor(agent_func)
+    mcp_executor = MCPAgentExecutor(agent_func, context=context, limiter=limiter)
     mcp_handler = GenAIMCPRequestHandler(executor=mcp_executor)
     
     # Create A2A server
@@ -283,79 +337,52 @@ async def main():
     """
     Main function to start all A2A servers with MCP support.
     """
-    # Define skills for each agent
-    planner_skill = A2AAgentSkill(
-        id="planner_agent",
-        name="Sustainable Planning Agent",
-        description="Creates sustainable coding plans for React components",
-        tags=["planning", "sustainability"]
-    )
-    
-    executor_skill = A2AAgentSkill(
-        id="executor_agent",
-        name="Code Execution Agent",
-        description="Generates React code based on sustainable plans",
-        tags=["react", "code-generation"]
-    )
-    
-    auditor_skill = A2AAgentSkill(
-        id="auditor_agent",
-        name="Sustainability Auditor",
-        description="Evaluates code plans for eco-friendliness",
-        tags=["sustainability", "audit"]
-    )
-    
-    full_stack_skill = A2AAgentSkill(
-        id="full_stack_agent",
-        name="Full Stack Sustainable Agent",
-        description="Orchestrates planning, execution, and auditing of sustainable code generation",
-        tags=["react", "sustainability", "code-generation"]
-    )
-    
     # Create A2A servers with MCP support for each agent
     planner_server = create_a2a_server_with_mcp(
         planner_agent,
-        planner_skill,
+        PLANNER_SKILL,
         "http://host.docker.internal:9001/",
         supports_json_input=False
     )
     
     executor_server = create_a2a_server_with_mcp(
         executor_agent,
-        executor_skill,
+        EXECUTOR_SKILL,
         "http://host.docker.internal:9002/",
         supports_json_input=True
     )
     
     auditor_server = create_a2a_server_with_mcp(
         auditor_agent,
-        auditor_skill,
+        AUDITOR_SKILL,
         "http://host.docker.internal:9003/",
         supports_json_input=True
     )
     
     full_stack_server = create_a2a_server_with_mcp(
         full_stack_agent,
-        full_stack_skill,
+        FULL_STACK_SKILL,
         "http://host.docker.internal:9004/",
         supports_json_input=False
     )
     
     # Log the server starting
-    print("Starting A2A servers with MCP support for all agents...")
-    print(f"Planner Agent: http://host.docker.internal:9001 (MCP enabled)")
-    print(f"Executor Agent: http://host.docker.internal:9002 (MCP enabled)")
-    print(f"Auditor Agent: http://host.docker.internal:9003 (MCP enabled)")
-    print(f"Full Stack Agent: http://host.docker.internal:9004 (MCP enabled)")
-    print("-" * 50)
+    logger.info("Starting A2A servers with MCP support for all agents...")
+    logger.info("Planner Agent: http://host.docker.internal:9001 (MCP enabled)")
+    logger.info("Executor Agent: http://host.docker.internal:9002 (MCP enabled)")
+    logger.info("Auditor Agent: http://host.docker.internal:9003 (MCP enabled)")
+    logger.info("Full Stack Agent: http://host.docker.internal:9004 (MCP enabled)")
     
-    # Run all servers concurrently
-    await asyncio.gather(
-        planner_server.start("0.0.0.0", 9001),
-        executor_server.start("0.0.0.0", 9002),
-        auditor_server.start("0.0.0.0", 9003),
-        full_stack_server.start("0.0.0.0", 9004)
-    )
+    # Run all servers concurrently; if one fails to start, the others are cancelled
+    servers = [
+        (planner_server, 9001),
+        (executor_server, 9002),
+        (auditor_server, 9003),
+        (full_stack_server, 9004)
+    ]
+    async with asyncio.TaskGroup() as tg:
+        for server, port in servers:
+            tg.create_task(server.start("0.0.0.0", port))
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    asyncio.run(main(), loop_factory=uvloop.new_event_loop if uvloop else None)
@@ -1,11 +1,21 @@
 import os
-import json
+import re
 import asyncio
+import functools
+import logging
+from dataclasses import dataclass
 from typing import Annotated
 
 from genai_session.session import GenAISession
 from genai_session.utils.context import GenAIContext
 
+try:
+    import uvloop
+except ImportError:  # uvloop is not available on Windows
+    uvloop = None
+
+logger = logging.getLogger(__name__)
+
 # --- Agent JWT & WebSocket Configuration ---
 
 AGENT_JWT_FULL_STACK = os.getenv("AGENT_JWT_FULL_STACK")
@@ -22,20 +32,20 @@ session_planner = GenAISession(jwt_token=AGENT_JWT_PLANNER, ws_url=WEBSOCKET_URL
 session_executor = GenAISession(jwt_token=AGENT_JWT_EXECUTOR, ws_url=WEBSOCKET_URL)
 session_auditor = GenAISession(jwt_token=AGENT_JWT_AUDITOR, ws_url=WEBSOCKET_URL)
 
+# --- Plan ---
+@dataclass(slots=True, frozen=True)
+class Plan:
+    """Immutable, hashable form of a planner plan, used as the auditor's cache key."""
+    components: tuple[str, ...] = ()
+    optimizations: tuple[str, ...] = ()
 
+    @classmethod
+    def from_dict(cls, plan: dict) -> "Plan":
+        """Builds a Plan from the JSON plan passed between agents."""
+        return cls(tuple(plan.get("components", ())), tuple(plan.get("optimizations", ())))
 
-# --- Agent 1: Planner Agent ---
-@session_planner.bind(
-    name="planner_agent",
-    description="Analyzes a user's request and creates a sustainable coding plan."
-)
-async def planner_agent(
-    agent_context: GenAIContext,
-    user_request: Annotated[str, "The user's plain-text request."]
-) -> dict:
-    """Creates a JSON plan based on sustainable coding heuristics."""
-    # Return a sample plan - in a real implementation, this would use the session's built-in LLM
-    system_prompt = """
+# --- Planner Prompt ---
+PLANNER_SYSTEM_PROMPT = """
         You are the Green-Stack Planner. Analyze the user's request and create a JSON plan.
         Your output MUST be a JSON object with "components" and "optimizations" keys.
             ### SUSTAINABLE HEURISTICS RULEBOOK ###
@@ -58,7 +68,139 @@ async def planner_agent(
     - HardwareAcceleratedProperties: Animate 'transform' and 'opacity'.
     - UseCSSVariablesForThemes: For theming (e.g., dark mode), use CSS Variables.
     """
-     
+
+# --- Auditor Scoring Rules ---
+# (optimization, bonus, penalty, component triggers, applied note, missing note)
+# The penalty applies when the optimization is missing and a component name
+# contains one of the triggers; triggers of None means it always applies.
+_AUDIT_RULES = (
+    # Data Transfer & Network Usage
+    ("NextGenFormats", 10, 5, None,
+     "✅ Using next-gen image formats (.webp/.avif) (+10 pts)",
+     "❌ Not using next-gen image formats (-5 pts)"),
+    ("LazyLoading", 15, 10, ("Table", "List", "Gallery"),
+     "✅ Implemented lazy loading for below-the-fold content (+15 pts)",
+     "❌ Missing lazy loading for large content (-10 pts)"),
+    ("ResponsiveImages", 10, 5, ("Image", "Photo", "Banner"),
+     "✅ Using responsive images with srcset attribute (+10 pts)",
+     "❌ Not using responsive images (-5 pts)"),
+    ("CodeSplitting", 10, 5, ("Chart", "Dashboard", "Modal"),
+     "✅ Implemented code splitting for large UI sections (+10 pts)",
+     "❌ Missing code splitting for complex UI elements (-5 pts)"),
+    ("PayloadReduction", 8, 5, ("Table", "List", "Data"),
+     "✅ Optimized API data fetching to reduce payload size (+8 pts)",
+     "❌ Not optimizing API data payload size (-5 pts)"),
+    ("AvoidPolling", 8, 8, ("Realtime", "Live", "Feed"),
+     "✅ Using WebSockets/SSE instead of polling (+8 pts)",
+     "❌ Using polling instead of WebSockets/SSE (-8 pts)"),
+    # Computation & JavaScript Execution
+    ("Memoization", 12, 10, ("List", "Table", "Grid"),
+     "✅ Using memoization for list/grid items (+12 pts)",
+     "❌ Missing memoization for list/grid items (-10 pts)"),
+    ("ConditionalRendering", 8, 5, ("Tab", "Modal", "Accordion"),
+     "✅ Properly unmounting non-visible components (+8 pts)",
+     "❌ Using CSS to hide components instead of unmounting (-5 pts)"),
+    ("DebounceStateUpdates", 8, 5, ("Search", "Filter", "Resize"),
+     "✅ Debouncing frequent event handlers (+8 pts)",
+     "❌ Not debouncing frequent events (-5 pts)"),
+    ("PromoteFlatState", 8, 5, ("Form", "Filter", "Dashboard"),
+     "✅ Using flat state structure for better performance (+8 pts)",
+     "❌ Using deeply nested state structure (-5 pts)"),
+    # Rendering & Browser Painting
+    ("PreferCSSTransitions", 8, 5, ("Animation", "Transition", "Hover"),
+     "✅ Using CSS for simple animations instead of JS (+8 pts)",
+     "❌ Using JS for animations that could be CSS (-5 pts)"),
+    ("HardwareAcceleratedProperties", 8, 5, ("Animation", "Transition"),
+     "✅ Using hardware-accelerated properties for animations (+8 pts)",
+     "❌ Not using hardware-accelerated properties (-5 pts)"),
+    ("UseCSSVariablesForThemes", 8, 5, ("Theme", "Dark", "Style"),
+     "✅ Using CSS variables for theming (+8 pts)",
+     "❌ Not using CSS variables for theming (-5 pts)"),
+)
+
+# All trigger words in one pattern, longest first. The lookahead reports a match
+# at every position, so overlapping words are not lost to an earlier match.
+_TRIGGER_WORDS = sorted(
+    {word for rule in _AUDIT_RULES if rule[3] for word in rule[3]}, key=len, reverse=True
+)
+_TRIGGER_RE = re.compile("(?=(%s))" % "|".join(map(re.escape, _TRIGGER_WORDS)))
+# Optimizations whose penalty each matched word triggers. A word also stands in
+# for any shorter trigger it contains ("Table" triggers the "Tab" rules too).
+_TRIGGERED_BY = {
+    word: frozenset(rule[0] for rule in _AUDIT_RULES if rule[3] and any(t in word for t in rule[3]))
+    for word in _TRIGGER_WORDS
+}
+
+# --- Auditor Recommendations ---
+# Suggestion for each optimization missing from a plan, in report order
+_RECOMMENDATIONS = {
+    "NextGenFormats": "- Use WebP or AVIF image formats instead of PNG/JPEG to reduce file sizes",
+    "LazyLoading": "- Implement React.lazy() for components that aren't immediately visible",
+    "ResponsiveImages": "- Use the srcset attribute to serve different image sizes based on viewport",
+    "CodeSplitting": "- Implement code-splitting for large components to reduce initial load time",
+    "PayloadReduction": "- Only fetch necessary fields from your API to reduce data transfer",
+    "AvoidPolling": "- Replace polling with WebSockets or Server-Sent Events for real-time updates",
+    "Memoization": "- Use React.memo() for list items to prevent unnecessary re-renders",
+    "ConditionalRendering": "- Unmount non-visible components instead of hiding them with CSS",
+    "DebounceStateUpdates": "- Implement debouncing for event handlers that trigger frequent updates",
+    "PromoteFlatState": "- Flatten your state structure to improve performance",
+    "PreferCSSTransitions": "- Use CSS transitions instead of JavaScript for simple animations",
+    "HardwareAcceleratedProperties": "- Animate transform and opacity properties for better performance",
+    "UseCSSVariablesForThemes": "- Implement CSS variables for theming to reduce JavaScript overhead",
+}
+
+# --- Executor Component ---
+_COMPONENT_TEMPLATE = """
+import React from 'react';
+
+const GeneratedComponent = () => {{
+  // Components: {components}
+  // Optimizations: {optimizations}
+  
+  return (
+    <div style={{{{padding: '20px'}}}}>
+      <h1>Generated React Component</h1>
+      <p>This component was generated based on the plan.</p>
+    </div>
+  );
+}};
+
+export default GeneratedComponent;
+"""
+
+# --- Auditor Report ---
+_REPORT_TEMPLATE = """
+### 🌍 Eco-Grade Report
+
+Your code achieved an Eco-Grade of **{eco_grade:.0f}/100**.
+
+---
+
+#### Score Breakdown:
+* **Page Weight Score:** {page_weight_score}/100 `(mocked)`
+* **Performance Score:** {performance_score:.0f}/100 `(mocked)`
+* **Best Practices Score:** {best_practices_score}/100
+
+## Sustainability Analysis:
+{notes}
+
+## Recommendations:
+
+{recommendations}"""
+
+
+# --- Agent 1: Planner Agent ---
+@session_planner.bind(
+    name="planner_agent",
+    description="Analyzes a user's request and creates a sustainable coding plan."
+)
+async def planner_agent(
+    agent_context: GenAIContext,
+    user_request: Annotated[str, "The user's plain-text request."]
+) -> dict:
+    """Creates a JSON plan based on sustainable coding heuristics."""
+    # Return a sample plan - in a real implementation, this would prompt the session's
+    # built-in LLM with PLANNER_SYSTEM_PROMPT
     return {
         "components": ["React Component", "CSS Styling"],
         "optimizations": ["LazyLoading", "Memoization", "ResponsiveImages"]
@@ -75,26 +217,18 @@ async def executor_agent(
     plan: Annotated[dict, "The JSON execution plan from the Planner Agent."]
 ) -> str:
     """Generates a single, self-contained React component from a plan."""
-    # Return sample React code - in a real implementation, this would use the session's built-in LLM
-    components = plan.get("components", [])
-    optimizations = plan.get("optimizations", [])
-    return f"""
-import React from 'react';
+    # Join before the cached call so the cache is keyed on two strings
+    return _render_component(
+        ", ".join(plan.get("components", [])),
+        ", ".join(plan.get("optimizations", []))
+    )
 
-const GeneratedComponent = () => {{
-  // Components: {', '.join(components)}
-  // Optimizations: {', '.join(optimizations)}
-  
-  return (
-    <div style={{{{padding: '20px'}}}}>
-      <h1>Generated React Component</h1>
-      <p>This component was generated based on the plan.</p>
-    </div>
-  );
-}};
 
-export default GeneratedComponent;
-"""
+@functools.lru_cache(maxsize=1024)
+def _render_component(components: str, optimizations: str) -> str:
+    """Renders the React component for a plan; cached per distinct plan."""
+    # Return sample React code - in a real implementation, this would use the session's built-in LLM
+    return _COMPONENT_TEMPLATE.format(components=components, optimizations=optimizations)
 
 
 # --- Agent 3: Auditor Agent ---
@@ -107,130 +241,47 @@ async def auditor_agent(
     plan: Annotated[dict, "The JSON execution plan from the Planner Agent."]
 ) -> dict:
     """Calculates a sustainability score and generates a markdown report."""
+    try:
+        audit = _audit(Plan.from_dict(plan))
+    except TypeError:
+        # Entries that can't be hashed or joined (e.g. nested lists) skip the cache
+        audit = _audit_uncached(plan)
+    # The cached result is shared between calls, so hand out fresh lists
+    return {**audit, "notes": list(audit["notes"]), "recommendations": list(audit["recommendations"])}
+
+
+@functools.lru_cache(maxsize=1024)
+def _audit(plan: Plan) -> dict:
+    """Scores a plan and renders its Eco-Grade report; cached per distinct plan."""
+    # One scan over all component names finds every triggered rule
+    triggered = set()
+    for word in set(_TRIGGER_RE.findall("\0".join(plan.components))):
+        triggered |= _TRIGGERED_BY[word]
+    return _build_audit(frozenset(plan.optimizations), triggered)
+
+
+def _audit_uncached(plan: dict) -> dict:
+    """Scores a plan whose entries can't key the cache, testing each component in turn."""
     optimizations = plan.get("optimizations", [])
     components = plan.get("components", [])
-      # 1. Calculate Best Practices Score
-     # 1. Calculate Best Practices Score
-    best_practices_score = 70  # Base score
-    notes = []
-    
-    # --- Data Transfer & Network Usage Heuristics ---
-    if "NextGenFormats" in optimizations: 
-        best_practices_score += 10
-        notes.append("✅ Using next-gen image formats (.webp/.avif) (+10 pts)")
-    else:
-        best_practices_score -= 5
-        notes.append("❌ Not using next-gen image formats (-5 pts)")
-    
-    if "LazyLoading" in optimizations: 
-        best_practices_score += 15
-        notes.append("✅ Implemented lazy loading for below-the-fold content (+15 pts)")
-    else:
-        has_large_content = any("Table" in s or "List" in s or "Gallery" in s for s in components)
-        if has_large_content:
-            best_practices_score -= 10
-            notes.append("❌ Missing lazy loading for large content (-10 pts)")
-    
-    if "ResponsiveImages" in optimizations: 
-        best_practices_score += 10
-        notes.append("✅ Using responsive images with srcset attribute (+10 pts)")
-    else:
-        has_images = any("Image" in s or "Photo" in s or "Banner" in s for s in components)
-        if has_images:
-            best_practices_score -= 5
-            notes.append("❌ Not using responsive images (-5 pts)")
-    
-    if "CodeSplitting" in optimizations: 
-        best_practices_score += 10
-        notes.append("✅ Implemented code splitting for large UI sections (+10 pts)")
-    else:
-        has_complex_ui = any("Chart" in s or "Dashboard" in s or "Modal" in s for s in components)
-        if has_complex_ui:
-            best_practices_score -= 5
-            notes.append("❌ Missing code splitting for complex UI elements (-5 pts)")
-    
-    if "PayloadReduction" in optimizations: 
-        best_practices_score += 8
-        notes.append("✅ Optimized API data fetching to reduce payload size (+8 pts)")
-    else:
-        has_data_fetching = any("Table" in s or "List" in s or "Data" in s for s in components)
-        if has_data_fetching:
-            best_practices_score -= 5
-            notes.append("❌ Not optimizing API data payload size (-5 pts)")
-    
-    if "AvoidPolling" in optimizations: 
-        best_practices_score += 8
-        notes.append("✅ Using WebSockets/SSE instead of polling (+8 pts)")
-    else:
-        has_realtime = any("Realtime" in s or "Live" in s or "Feed" in s for s in components)
-        if has_realtime:
-            best_practices_score -= 8
-            notes.append("❌ Using polling instead of WebSockets/SSE (-8 pts)")
-    
-    # --- Computation & JavaScript Execution Heuristics ---
-    if "Memoization" in optimizations: 
-        best_practices_score += 12
-        notes.append("✅ Using memoization for list/grid items (+12 pts)")
-    else:
-        is_list = any("List" in s or "Table" in s or "Grid" in s for s in components)
-        if is_list:
-            best_practices_score -= 10
-            notes.append("❌ Missing memoization for list/grid items (-10 pts)")
-    
-    if "ConditionalRendering" in optimizations: 
-        best_practices_score += 8
-        notes.append("✅ Properly unmounting non-visible components (+8 pts)")
-    else:
-        has_conditional_ui = any("Tab" in s or "Modal" in s or "Accordion" in s for s in components)
-        if has_conditional_ui:
-            best_practices_score -= 5
-            notes.append("❌ Using CSS to hide components instead of unmounting (-5 pts)")
-    
-    if "DebounceStateUpdates" in optimizations: 
-        best_practices_score += 8
-        notes.append("✅ Debouncing frequent event handlers (+8 pts)")
-    else:
-        has_frequent_events = any("Search" in s or "Filter" in s or "Resize" in s for s in components)
-        if has_frequent_events:
-            best_practices_score -= 5
-            notes.append("❌ Not debouncing frequent events (-5 pts)")
-    
-    if "PromoteFlatState" in optimizations: 
-        best_practices_score += 8
-        notes.append("✅ Using flat state structure for better performance (+8 pts)")
-    else:
-        has_complex_state = any("Form" in s or "Filter" in s or "Dashboard" in s for s in components)
-        if has_complex_state:
-            best_practices_score -= 5
-            notes.append("❌ Using deeply nested state structure (-5 pts)")
-    
-    # --- Rendering & Browser Painting Heuristics ---
-    if "PreferCSSTransitions" in optimizations: 
-        best_practices_score += 8
-        notes.append("✅ Using CSS for simple animations instead of JS (+8 pts)")
-    else:
-        has_animations = any("Animation" in s or "Transition" in s or "Hover" in s for s in components)
-        if has_animations:
-            best_practices_score -= 5
-            notes.append("❌ Using JS for animations that could be CSS (-5 pts)")
-    
-    if "HardwareAcceleratedProperties" in optimizations: 
-        best_practices_score += 8
-        notes.append("✅ Using hardware-accelerated properties for animations (+8 pts)")
-    else:
-        has_animations = any("Animation" in s or "Transition" in s for s in components)
-        if has_animations:
-            best_practices_score -= 5
-            notes.append("❌ Not using hardware-accelerated properties (-5 pts)")
-    
-    if "UseCSSVariablesForThemes" in optimizations: 
-        best_practices_score += 8
-        notes.append("✅ Using CSS variables for theming (+8 pts)")
-    else:
-        has_theming = any("Theme" in s or "Dark" in s or "Style" in s for s in components)
-        if has_theming:
-            best_practices_score -= 5
-            notes.append("❌ Not using CSS variables for theming (-5 pts)")
+    triggered = {
+        flag for flag, _, _, triggers, _, _ in _AUDIT_RULES
+        if triggers and any(t in s for s in components for t in triggers)
+    }
+    return _build_audit(optimizations, triggered)
+
+
+def _build_audit(opts, triggered: set) -> dict:
+    """Builds the audit result from a plan's optimizations and its triggered rules."""
+    # 1. Calculate Best Practices Score
+    # (score delta, note) for every rule that applies to this plan
+    outcomes = [
+        (bonus, applied_note) if flag in opts else (-penalty, missing_note)
+        for flag, bonus, penalty, triggers, applied_note, missing_note in _AUDIT_RULES
+        if flag in opts or triggers is None or flag in triggered
+    ]
+    best_practices_score = 70 + sum(delta for delta, _ in outcomes)  # Base score of 70
+    notes = [note for _, note in outcomes]
     
     # Cap score between 0 and 100
     best_practices_score = min(max(best_practices_score, 0), 100)
@@ -250,67 +301,16 @@ async def auditor_agent(
     eco_grade = (page_weight_score * 0.5) + (performance_score * 0.3) + (best_practices_score * 0.2)
 
     # 5. Generate Report Text
-    report_text = f"""
-### 🌍 Eco-Grade Report
-
-Your code achieved an Eco-Grade of **{eco_grade:.0f}/100**.
-
----
-
-#### Score Breakdown:
-* **Page Weight Score:** {page_weight_score}/100 `(mocked)`
-* **Performance Score:** {performance_score:.0f}/100 `(mocked)`
-* **Best Practices Score:** {best_practices_score}/100
-
-## Sustainability Analysis:
-{chr(10).join(notes) if notes else "No specific notes."}
-
-## Recommendations:
-"""
-    
-    # Add recommendations based on missing optimizations
-    missing_optimizations = []
-    all_optimizations = [
-        "NextGenFormats", "LazyLoading", "ResponsiveImages", "CodeSplitting", 
-        "PayloadReduction", "AvoidPolling", "Memoization", "ConditionalRendering", 
-        "DebounceStateUpdates", "PromoteFlatState", "PreferCSSTransitions", 
-        "HardwareAcceleratedProperties", "UseCSSVariablesForThemes"
-    ]
-    
-    for opt in all_optimizations:
-        if opt not in optimizations:
-            if opt == "NextGenFormats":
-                missing_optimizations.append("- Use WebP or AVIF image formats instead of PNG/JPEG to reduce file sizes")
-            elif opt == "LazyLoading":
-                missing_optimizations.append("- Implement React.lazy() for components that aren't immediately visible")
-            elif opt == "ResponsiveImages":
-                missing_optimizations.append("- Use the srcset attribute to serve different image sizes based on viewport")
-            elif opt == "CodeSplitting":
-                missing_optimizations.append("- Implement code-splitting for large components to reduce initial load time")
-            elif opt == "PayloadReduction":
-                missing_optimizations.append("- Only fetch necessary fields from your API to reduce data transfer")
-            elif opt == "AvoidPolling":
-                missing_optimizations.append("- Replace polling with WebSockets or Server-Sent Events for real-time updates")
-            elif opt == "Memoization":
-                missing_optimizations.append("- Use React.memo() for list items to prevent unnecessary re-renders")
-            elif opt == "ConditionalRendering":
-                missing_optimizations.append("- Unmount non-visible components instead of hiding them with CSS")
-            elif opt == "DebounceStateUpdates":
-                missing_optimizations.append("- Implement debouncing for event handlers that trigger frequent updates")
-            elif opt == "PromoteFlatState":
-                missing_optimizations.append("- Flatten your state structure to improve performance")
-            elif opt == "PreferCSSTransitions":
-                missing_optimizations.append("- Use CSS transitions instead of JavaScript for simple animations")
-            elif opt == "HardwareAcceleratedProperties":
-                missing_optimizations.append("- Animate transform and opacity properties for better performance")
-            elif opt == "UseCSSVariablesForThemes":
-                missing_optimizations.append("- Implement CSS variables for theming to reduce JavaScript overhead")
-    
-    # Add recommendations to the report
-    if missing_optimizations:
-        report_text += "\n" + "\n".join(missing_optimizations)
-    else:
-        report_text += "\nNo specific recommendations. All sustainable practices are already implemented."
+    missing_optimizations = [rec for opt, rec in _RECOMMENDATIONS.items() if opt not in opts]
+    report_text = _REPORT_TEMPLATE.format_map({
+        "eco_grade": eco_grade,
+        "page_weight_score": page_weight_score,
+        "performance_score": performance_score,
+        "best_practices_score": best_practices_score,
+        "notes": "\n".join(notes) if notes else "No specific notes.",
+        "recommendations": "\n".join(missing_optimizations) if missing_optimizations
+            else "No specific recommendations. All sustainable practices are already implemented."
+    })
     
     return {
         "report_markdown": report_text, 
@@ -318,21 +318,44 @@ Your code achieved an Eco-Grade of **{eco_grade:.0f}/100**.
         "best_practices_score": best_practices_score,
         "page_weight_score": page_weight_score,
         "performance_score": performance_score,
-        "notes": notes,
-        "recommendations": missing_optimizations
+        "notes": tuple(notes),
+        "recommendations": tuple(missing_optimizations)
+    }
+
+
+# --- Agent 4: Full Stack Agent ---
+@session_full_stack.bind(
+    name="full_stack_agent",
+    description="Orchestrates planning, code generation and auditing for a user's request."
+)
+async def full_stack_agent(
+    agent_context: GenAIContext,
+    prompt: Annotated[str, "The user's plain-text request."]
+) -> dict:
+    """Plans the request, then generates code and audits the plan concurrently."""
+    plan = await planner_agent(agent_context, prompt)
+    # Executor and auditor only depend on the plan, so run them side by side
+    generated_code, audit = await asyncio.gather(
+        executor_agent(agent_context, plan),
+        auditor_agent(agent_context, plan)
+    )
+    return {
+        "plan": plan,
+        "generated_code": generated_code,
+        "report_markdown": audit["report_markdown"],
+        "eco_grade": audit["eco_grade"]
     }
 
 
 # --- Application Startup ---
 async def main():
     """Main function to start all agents and process their events concurrently."""
-    print("Starting all agents...")
-    await asyncio.gather(
-        session_full_stack.process_events(),
-        session_planner.process_events(),
-        session_executor.process_events(),
-        session_auditor.process_events()
-    )
+    logger.info("Starting all agents...")
+    # If one session fails, the TaskGroup cancels the others instead of leaving them running
+    async with asyncio.TaskGroup() as tg:
+        for session in (session_full_stack, session_planner, session_executor, session_auditor):
+            tg.create_task(session.process_events())
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main(), loop_factory=uvloop.new_event_loop if uvloop else None)